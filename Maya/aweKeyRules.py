@@ -0,0 +1,304 @@
+"""
+aweKeyRules.py
+Author: AwesomeAD
+
+The key analysis rules used by aweSmartTangents, as plain Python.
+
+None of the rules in this module talk to Maya; they work on lists of key
+values (as returned by `keyframe -q -vc`) so they can be run and checked
+outside of Maya.
+
+Running the module directly checks the rules against a set of reference
+curves and measures how many keys per second they handle:
+
+    python aweKeyRules.py
+"""
+
+import random
+import time
+
+
+FLAT = "flat"
+SPLINE = "spline"
+
+# tangent angles (in degrees) below this are considered flat
+ANGLE_TOLERANCE = 0.001
+
+
+def classifyKeys(values, tolerance):
+    """ Return the tangent type for each key of a curve.
+
+        `values`: key values of the curve, in key order
+        `tolerance`: values closer than this are considered equal
+
+        First and last keys are flat if they're equal to their neighbour, else spline.
+        Keys in between are flat if they're an extreme (larger or smaller than both
+        neighbours) or equal to one of their neighbours; everything else is a
+        classic inbetween and gets spline tangents.
+        A curve with a single key gets flat tangents.
+    """
+
+    count = len(values)
+    if count < 2:
+        return [FLAT] * count
+
+    types = [SPLINE] * count
+    if abs(values[0] - values[1]) <= tolerance:
+        types[0] = FLAT
+    if abs(values[-1] - values[-2]) <= tolerance:
+        types[-1] = FLAT
+
+    # single pass over all (previous, this, next) triplets
+    for i, (prevValue, value, nextValue) in enumerate(zip(values, values[1:], values[2:]), 1):
+        if (value > prevValue and value > nextValue) or (value < prevValue and value < nextValue):
+            types[i] = FLAT
+        elif abs(value - prevValue) <= tolerance or abs(value - nextValue) <= tolerance:
+            types[i] = FLAT
+
+    return types
+
+
+def classifyCurves(valueLists, tolerance):
+    """ Classify the keys of several curves; see classifyKeys().
+
+        Takes and returns one list per curve, so a chunk of curve data can be
+        handed to a worker process as a whole.
+    """
+
+    return [classifyKeys(values, tolerance) for values in valueLists]
+
+
+def groupIndices(types):
+    """ Group key indices by tangent type.
+
+        Returns a dict of {type: [(start, end), ...]} with consecutive indices
+        merged into inclusive ranges, ready to be passed as `index` flags.
+    """
+
+    groups = {}
+    start = 0
+    for i in range(1, len(types) + 1):
+        if i == len(types) or types[i] != types[start]:
+            groups.setdefault(types[start], []).append((start, i - 1))
+            start = i
+    return groups
+
+
+def indexRanges(indices):
+    """ Merge sorted key indices into inclusive (start, end) ranges. """
+
+    ranges = []
+    for i in indices:
+        if ranges and ranges[-1][1] == i - 1:
+            ranges[-1] = (ranges[-1][0], i)
+        else:
+            ranges.append((i, i))
+    return ranges
+
+
+def redundantKeys(values, tolerance=0.0, inAngles=None, outAngles=None):
+    """ Return the indices of keys that lie inside a run of held values.
+
+        `values`: key values of the curve, in key order
+        `tolerance`: values closer than this are considered equal
+        `inAngles`, `outAngles`: optional tangent angles of the keys; if given, the
+        curve must also be flat between two keys for them to count as held
+
+        A run is measured against the value of the key it starts with, so slow
+        drifts that stay below the tolerance from key to key still end a run.
+        The first and last key of a run (and of the curve) are never redundant.
+    """
+
+    count = len(values)
+    checkAngles = inAngles is not None and outAngles is not None
+    # run id of each segment between key i and i + 1, None if the segment isn't held
+    runs = []
+    run = -1
+    anchor = None
+    for i in range(count - 1):
+        held = abs(values[i + 1] - values[i]) <= tolerance
+        if held and checkAngles:
+            held = abs(outAngles[i]) <= ANGLE_TOLERANCE and abs(inAngles[i + 1]) <= ANGLE_TOLERANCE
+        if not held:
+            runs.append(None)
+            anchor = None
+            continue
+        if anchor is None or abs(values[i + 1] - anchor) > tolerance:
+            run += 1
+            anchor = values[i]
+        runs.append(run)
+
+    return [i for i in range(1, count - 1) if runs[i - 1] is not None and runs[i - 1] == runs[i]]
+
+
+def keptFrames(times, redundant):
+    """ Return the set of frames of all keys that are not in `redundant`.
+
+        `times`: key times of the curve, in key order
+        `redundant`: indices as returned by redundantKeys()
+    """
+
+    redundant = set(redundant)
+    return set(t for i, t in enumerate(times) if i not in redundant)
+
+
+def isStatic(values, tolerance=0.0, inAngles=None, outAngles=None):
+    """ Return True if a curve never changes by more than `tolerance`.
+
+        `values`: key values of the curve
+        `inAngles`, `outAngles`: optional tangent angles of the keys; if given, all
+        of them must be flat, otherwise the curve overshoots between its keys
+
+        Curves without keys are not considered static (there's nothing to delete).
+    """
+
+    if not values:
+        return False
+    if max(values) - min(values) > tolerance:
+        return False
+    if inAngles is not None and outAngles is not None:
+        return all(abs(a) <= ANGLE_TOLERANCE for a in inAngles) and \
+            all(abs(a) <= ANGLE_TOLERANCE for a in outAngles)
+    return True
+
+
+def _closestWrap(angle, reference):
+    """ Return `angle` plus the multiple of 360 that brings it closest to `reference`. """
+
+    return angle + 360.0 * round((reference - angle) / 360.0)
+
+
+def unwrapAngles(values):
+    """ Remove jumps of multiples of 360 degrees from a single rotation channel. """
+
+    result = list(values[:1])
+    for value in values[1:]:
+        result.append(_closestWrap(value, result[-1]))
+    return result
+
+
+def eulerFilter(rotations, middleAxis=1):
+    """ Filter a sequence of euler rotations for continuity.
+
+        `rotations`: list of (x, y, z) tuples in degrees, one per key
+        `middleAxis`: index of the second axis of the rotate order
+                      (y for xyz and zyx, z for yzx and xzy, x for zxy and yxz)
+
+        Each rotation is compared against the filtered previous one in two
+        equivalent forms: as is, and with the outer axes turned by 180 degrees
+        and the middle axis mirrored. The closer form (after removing jumps of
+        multiples of 360 degrees) is kept.
+        Returns the filtered rotations and a list of flags that are True where
+        the mirrored form was used.
+    """
+
+    if not rotations:
+        return [], []
+
+    filtered = [tuple(rotations[0])]
+    flipped = [False]
+    for rotation in rotations[1:]:
+        previous = filtered[-1]
+        alternative = [angle + 180.0 for angle in rotation]
+        alternative[middleAxis] = 180.0 - rotation[middleAxis]
+        best = None
+        for isFlipped, candidate in ((False, rotation), (True, alternative)):
+            candidate = tuple(_closestWrap(a, p) for a, p in zip(candidate, previous))
+            distance = sum(abs(a - p) for a, p in zip(candidate, previous))
+            if best is None or distance < best[0]:
+                best = (distance, candidate, isFlipped)
+        filtered.append(best[1])
+        flipped.append(best[2])
+    return filtered, flipped
+
+
+# reference curves: (name, values, expected tangent types, expected redundant keys)
+# all of them are evaluated with REFERENCE_TOLERANCE
+REFERENCE_TOLERANCE = 0.01
+REFERENCE_CURVES = [
+    ("single key", [5.0],
+     [FLAT], []),
+    ("ramp", [0.0, 1.0, 2.0, 3.0],
+     [SPLINE, SPLINE, SPLINE, SPLINE], []),
+    ("peak", [0.0, 5.0, 0.0],
+     [SPLINE, FLAT, SPLINE], []),
+    ("valleys", [3.0, 1.0, 3.0, 1.0, 3.0],
+     [SPLINE, FLAT, FLAT, FLAT, SPLINE], []),
+    ("hold", [0.0, 1.0, 1.0, 1.0, 2.0],
+     [SPLINE, FLAT, FLAT, FLAT, SPLINE], [2]),
+    ("flat ends", [1.0, 1.0, 3.0, 3.0],
+     [FLAT, FLAT, FLAT, FLAT], []),
+    ("long hold", [2.0, 2.0, 2.0, 2.0, 2.0],
+     [FLAT, FLAT, FLAT, FLAT, FLAT], [1, 2, 3]),
+    # the MEL version compared with the previous key using a fixed 0.1
+    ("inbetween close to previous key", [0.0, 1.0, 1.05, 2.0],
+     [SPLINE, SPLINE, SPLINE, SPLINE], []),
+    ("slow drift", [0.0, 0.006, 0.012, 0.018],
+     [FLAT, FLAT, FLAT, FLAT], []),
+]
+
+
+def checkReference():
+    """ Run the rules on REFERENCE_CURVES.
+
+        Returns a list of (name, rule, expected, result) for every mismatch.
+    """
+
+    failures = []
+    for name, values, types, redundant in REFERENCE_CURVES:
+        result = classifyKeys(values, REFERENCE_TOLERANCE)
+        if result != types:
+            failures.append((name, "classifyKeys", types, result))
+        result = redundantKeys(values, REFERENCE_TOLERANCE)
+        if result != redundant:
+            failures.append((name, "redundantKeys", redundant, result))
+    return failures
+
+
+def syntheticCurves(curveCount, keyCount, seed=0):
+    """ Return `curveCount` lists of `keyCount` random key values.
+
+        Values are random walks with occasional holds, so all rules get their
+        share of work.
+    """
+
+    rand = random.Random(seed)
+    valueLists = []
+    for _ in range(curveCount):
+        value = 0.0
+        values = []
+        for _ in range(keyCount):
+            if rand.random() > 0.3:
+                value += rand.uniform(-1.0, 1.0)
+            values.append(value)
+        valueLists.append(values)
+    return valueLists
+
+
+def benchmark(curveCount=2000, keyCount=100, tolerance=0.1):
+    """ Time the rules on synthetic curves.
+
+        Returns a dict of {rule: keys per second}.
+    """
+
+    valueLists = syntheticCurves(curveCount, keyCount)
+    keyTotal = float(curveCount * keyCount)
+    rules = [
+        ("classifyKeys", lambda: classifyCurves(valueLists, tolerance)),
+        ("redundantKeys", lambda: [redundantKeys(values, tolerance) for values in valueLists]),
+    ]
+    results = {}
+    for name, rule in rules:
+        start = time.time()
+        rule()
+        results[name] = keyTotal / max(time.time() - start, 1e-9)
+    return results
+
+
+if __name__ == '__main__':
+    failures = checkReference()
+    for name, rule, expected, result in failures:
+        print("FAIL %s (%s): expected %s, got %s" % (name, rule, expected, result))
+    print("%d reference curves, %d failures" % (len(REFERENCE_CURVES), len(failures)))
+    for name, keysPerSecond in sorted(benchmark().items()):
+        print("%-14s %12.0f keys/s" % (name, keysPerSecond))
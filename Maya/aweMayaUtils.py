@@ -0,0 +1,19 @@
+"""
+aweMayaUtils.py
+Author: AwesomeAD
+
+The few Maya side definitions shared by aweSmartTangentsLib and
+aweRippleKeysLib, so the two tools don't each keep their own copy.
+"""
+
+import maya.mel as mel
+
+
+# time based animCurves only; animCurveU* are driven keys
+TIME_CURVE_TYPES = ['animCurveTA', 'animCurveTL', 'animCurveTT', 'animCurveTU']
+
+
+def mainProgressBar():
+    """ Return the name of Maya's main progress bar. """
+
+    return mel.eval("global string $gMainProgressBar; $tmp = $gMainProgressBar")
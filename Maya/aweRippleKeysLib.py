@@ -0,0 +1,356 @@
+"""
+aweRippleKeysLib.py
+Author: AwesomeAD
+
+Python engine behind the scene scope of aweRippleKeys.mel.
+
+Rippling every animCurve in the scene used to mean building one keyframe
+command string holding all curve names and evaluating it. Here the curves are
+passed as data and shifted in chunks, with a single undo chunk around the
+whole edit and progress shown in the main progress bar.
+
+Only time based curves are rippled (driven keys stay where they are).
+Referenced curves, locked curves and curves of given namespaces can be left
+out as well. The filtered curve list is cached by a RippleCurves instance and
+only rebuilt when callbacks report curves being added, removed, renamed or
+reconnected, so repeated ripples don't re-list the whole scene.
+
+Editorial conforms with many inserts and removals can be applied in a single
+pass with rippleEdits(), which takes an edit decision list of (frame, delta)
+pairs.
+
+Usage in Maya (normally called from aweRippleKeys):
+import aweRippleKeysLib
+aweRippleKeysLib.rippleScene(cmds.currentTime(q=True), 5)
+aweRippleKeysLib.rippleEdits([(120, 8), (300, -12), (410, 24)])
+"""
+
+
+import bisect
+import math
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+import aweKeyRules
+import aweMayaUtils
+
+
+# number of curves shifted with one keyframe command
+CHUNK_SIZE = 1000
+
+
+def inNamespaces(name, namespaces):
+    """ Return True if node `name` lives in one of `namespaces` (or below). """
+
+    name = name.lstrip(':')
+    return any(name.startswith(ns.strip(':') + ':') for ns in namespaces)
+
+
+class RippleCurves(object):
+    """ Cached list of the animCurves a scene ripple applies to.
+
+        `skipReferenced`: leave out curves from referenced files
+        `excludeNamespaces`: leave out curves that live in, or animate nodes in,
+                             any of these namespaces
+
+        Locked curves are left out as well (with `skipLocked`), but since Maya
+        has no callback for lock changes, that is checked with a single
+        lockNode query each time curves() is called.
+    """
+
+    def __init__(self):
+        self.skipLocked = False
+        self.skipReferenced = False
+        self.excludeNamespaces = ()
+        self._curves = None
+        self._callbacks = []
+        self.builds = 0
+
+    def setOptions(self, skipLocked=False, skipReferenced=False, excludeNamespaces=()):
+        """ Change the filter options; the cached list is rebuilt if they differ. """
+
+        excludeNamespaces = tuple(sorted(ns for ns in excludeNamespaces if ns))
+        if (skipReferenced, excludeNamespaces) != (self.skipReferenced, self.excludeNamespaces):
+            self._curves = None
+        self.skipLocked = skipLocked
+        self.skipReferenced = skipReferenced
+        self.excludeNamespaces = excludeNamespaces
+
+    def curves(self):
+        """ Return the filtered list of animCurves. """
+
+        if self._curves is None:
+            self._curves = self._build()
+            self.builds += 1
+        curves = self._curves
+        if self.skipLocked and curves:
+            locked = cmds.lockNode(curves, q=True, lock=True) or []
+            curves = [c for c, isLocked in zip(curves, locked) if not isLocked]
+        return list(curves)
+
+    def _build(self):
+        curves = cmds.ls(type=aweMayaUtils.TIME_CURVE_TYPES) or []
+        if self.skipReferenced and curves:
+            referenced = set(cmds.ls(curves, referencedNodes=True) or [])
+            curves = [c for c in curves if c not in referenced]
+        if self.excludeNamespaces and curves:
+            excluded = set(c for c in curves if inNamespaces(c, self.excludeNamespaces))
+            pairs = cmds.listConnections(curves, s=False, d=True, connections=True,
+                                         skipConversionNodes=True) or []
+            for plug, node in zip(pairs[::2], pairs[1::2]):
+                if inNamespaces(node, self.excludeNamespaces):
+                    excluded.add(plug.split('.')[0])
+            curves = [c for c in curves if c not in excluded]
+        return curves
+
+    def invalidate(self):
+        self._curves = None
+
+    def install(self):
+        """ Register the callbacks that keep the cached list up to date. """
+
+        if self._callbacks:
+            return
+        self._callbacks = [
+            om.MDGMessage.addNodeAddedCallback(self._changed, 'animCurve'),
+            om.MDGMessage.addNodeRemovedCallback(self._changed, 'animCurve'),
+            om.MDGMessage.addConnectionCallback(self._connectionChanged),
+            om.MNodeMessage.addNameChangedCallback(om.MObject(), self._nameChanged),
+            om.MEventMessage.addEventCallback('Undo', self._changed),
+            om.MEventMessage.addEventCallback('Redo', self._changed),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeNew, self._changed),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeOpen, self._changed),
+        ]
+
+    def uninstall(self):
+        om.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+        self.invalidate()
+
+    def _changed(self, *args):
+        self._curves = None
+
+    def _connectionChanged(self, sourcePlug, destinationPlug, *args):
+        # only matters for the namespace filter, which looks at the animated nodes
+        if self.excludeNamespaces and sourcePlug.node().hasFn(om.MFn.kAnimCurve):
+            self._curves = None
+
+    def _nameChanged(self, node, previousName, *args):
+        if node.hasFn(om.MFn.kAnimCurve) or (self.excludeNamespaces and ':' in previousName):
+            self._curves = None
+        elif self.excludeNamespaces and node.hasFn(om.MFn.kDependencyNode):
+            # a node may have been moved into an excluded namespace
+            if inNamespaces(om.MFnDependencyNode(node).name(), self.excludeNamespaces):
+                self._curves = None
+
+
+_rippleCurves = None
+
+
+def getRippleCurves():
+    """ Return the RippleCurves instance shared by all scene ripples. """
+
+    global _rippleCurves
+    if _rippleCurves is None:
+        _rippleCurves = RippleCurves()
+        _rippleCurves.install()
+    return _rippleCurves
+
+
+def chunkList(items, chunkSize):
+    return [items[i:i + chunkSize] for i in range(0, len(items), chunkSize)]
+
+
+def rippleCurves(curves, frame, delta, chunkSize=CHUNK_SIZE):
+    """ Shift all keys of `curves` at or after `frame` by `delta` frames.
+
+        Keys in the way of the shifted keys are replaced (like Maya's own
+        add/remove inbetween). The edit is a single undo step and all or
+        nothing: if it's interrupted between chunks, or a chunk fails, the
+        chunks already shifted are undone. With undo turned off that isn't
+        possible; the partial ripple is reported instead.
+        Returns the number of curves that were processed.
+    """
+
+    if not curves or not delta:
+        return 0
+
+    chunks = chunkList(curves, chunkSize)
+
+    gMainProgressBar = aweMayaUtils.mainProgressBar()
+    cmds.progressBar(gMainProgressBar, e=True, beginProgress=True, isInterruptable=True,
+                     status="Rippling %d curves" % len(curves), maxValue=len(chunks))
+
+    curvesDone = 0
+    completed = False
+    # without undo recording, undo() would revert some earlier action
+    canUndo = cmds.undoInfo(q=True, state=True)
+    cmds.undoInfo(openChunk=True)
+    try:
+        for chunk in chunks:
+            if cmds.progressBar(gMainProgressBar, q=True, isCancelled=True):
+                break
+            cmds.keyframe(chunk, time=('%s:' % frame,), relative=True, timeChange=delta, option='over')
+            curvesDone += len(chunk)
+            cmds.progressBar(gMainProgressBar, e=True, step=1)
+        else:
+            completed = True
+    finally:
+        cmds.undoInfo(closeChunk=True)
+        # never leave the scene half rippled
+        partial = not completed and curvesDone
+        if partial and canUndo:
+            cmds.undo()
+        elif partial:
+            print("Interrupted after rippling %d of %d curves; undo is turned off, so they can't be reverted.\n"
+                  % (curvesDone, len(curves)))
+        cmds.progressBar(gMainProgressBar, e=True, endProgress=True)
+
+    if not completed:
+        if canUndo or not curvesDone:
+            print("Ripple cancelled, no keys have been moved.\n")
+            return 0
+    return curvesDone
+
+
+def combineEdits(edits):
+    """ Combine an edit decision list into a single time remap.
+
+        `edits`: (frame, delta) pairs; every edit shifts the keys at or after
+                 `frame` by `delta` frames, all frames refer to the timeline
+                 before the conform
+
+        Returns the sorted segment boundaries and the total offset of each
+        segment: keys at time t with boundaries[k] <= t < boundaries[k + 1] move
+        by offsets[k], keys before boundaries[0] stay where they are.
+    """
+
+    deltas = {}
+    for frame, delta in edits:
+        deltas[frame] = deltas.get(frame, 0) + delta
+    boundaries = sorted(f for f in deltas if deltas[f])
+    offsets = []
+    total = 0
+    for frame in boundaries:
+        total += deltas[frame]
+        offsets.append(total)
+    return boundaries, offsets
+
+
+def remapTimes(times, boundaries, offsets):
+    """ Apply a combined time remap (see combineEdits()) to the key times of a curve.
+
+        `times`: key times of the curve, in key order
+
+        Returns the new time of each key and the indices of the keys that get
+        dropped because a later key lands on or before them (removed frames,
+        just like removing them one by one with option over would do).
+    """
+
+    newTimes = []
+    for t in times:
+        segment = bisect.bisect_right(boundaries, t) - 1
+        newTimes.append(t + offsets[segment] if segment >= 0 else t)
+
+    dropped = []
+    limit = None
+    for i in range(len(newTimes) - 1, -1, -1):
+        if limit is not None and newTimes[i] >= limit:
+            dropped.append(i)
+        else:
+            limit = newTimes[i]
+    dropped.reverse()
+    return newTimes, dropped
+
+
+def rippleEdits(edits, curves=None, chunkSize=CHUNK_SIZE):
+    """ Apply an edit decision list of (frame, delta) pairs to `curves`
+        (or the filtered curves of the scene, see RippleCurves) in one pass.
+
+        The edits are combined into one time remap first (see combineEdits()).
+        Each curve's key times are read once; bisection finds the keys at or
+        after the first edit and the segments the curve has keys in.
+        Keys are then moved with one keyframe call per segment for all curves
+        that have keys in it: affected keys are parked after the last key of
+        the scene and moved to their final time from the last segment to the
+        first, so no key lands on a key that hasn't moved yet. Unparked keys do
+        pass over keys that are still parked, so the moves use option over;
+        keys that would end up being landed on were already dropped.
+        The whole conform is a single undo step.
+        Returns the number of curves that had keys moved.
+    """
+
+    boundaries, offsets = combineEdits(edits)
+    if curves is None:
+        curves = getRippleCurves().curves()
+    if not boundaries or not curves:
+        return 0
+
+    gMainProgressBar = aweMayaUtils.mainProgressBar()
+    cmds.progressBar(gMainProgressBar, e=True, beginProgress=True, isInterruptable=True,
+                     status="Reading %d curves" % len(curves), maxValue=len(curves) + len(boundaries) + 1)
+    try:
+        # read: find affected curves, the segments they have keys in and keys to drop
+        affected = []
+        segmentCurves = [[] for _ in boundaries]
+        dropped = {}
+        lastTime = boundaries[-1]
+        for i, curve in enumerate(curves):
+            if i % chunkSize == 0:
+                # nothing has been changed yet, so it's safe to stop here
+                if cmds.progressBar(gMainProgressBar, q=True, isCancelled=True):
+                    print("Conform cancelled, no keys have been moved.\n")
+                    return 0
+                cmds.progressBar(gMainProgressBar, e=True, step=min(chunkSize, len(curves) - i))
+            times = cmds.keyframe(curve, q=True, timeChange=True) or []
+            positions = [bisect.bisect_left(times, b) for b in boundaries] + [len(times)]
+            if positions[0] == len(times):
+                continue
+            affected.append(curve)
+            lastTime = max(lastTime, times[-1])
+            for k in range(len(boundaries)):
+                if positions[k] < positions[k + 1]:
+                    segmentCurves[k].append(curve)
+            drop = remapTimes(times, boundaries, offsets)[1]
+            if drop:
+                dropped[curve] = drop
+
+        # whole frames, so parking and unparking doesn't add up rounding errors
+        park = math.ceil(lastTime + max(0, max(offsets)) - boundaries[0] + 1)
+
+        # write: not interruptable, keys must not be left parked
+        cmds.progressBar(gMainProgressBar, e=True, status="Conforming %d curves" % len(affected))
+        cmds.undoInfo(openChunk=True)
+        cmds.refresh(suspend=True)
+        try:
+            for curve, indices in dropped.items():
+                cmds.cutKey(curve, index=aweKeyRules.indexRanges(indices), clear=True)
+            for chunk in chunkList(affected, chunkSize):
+                cmds.keyframe(chunk, time=('%s:' % boundaries[0],), relative=True, timeChange=park,
+                              option='over')
+            cmds.progressBar(gMainProgressBar, e=True, step=1)
+            for k in range(len(boundaries) - 1, -1, -1):
+                for chunk in chunkList(segmentCurves[k], chunkSize):
+                    cmds.keyframe(chunk, time=('%s:' % (boundaries[k] + park),), relative=True,
+                                  timeChange=offsets[k] - park, option='over')
+                cmds.progressBar(gMainProgressBar, e=True, step=1)
+        finally:
+            cmds.refresh(suspend=False)
+            cmds.undoInfo(closeChunk=True)
+    finally:
+        cmds.progressBar(gMainProgressBar, e=True, endProgress=True)
+
+    print("Conformed %d curves with %d edits.\n" % (len(affected), len(edits)))
+    return len(affected)
+
+
+def rippleScene(frame, delta, skipLocked=False, skipReferenced=False, excludeNamespaces=(),
+                chunkSize=CHUNK_SIZE):
+    """ Shift the keys of all time based animCurves in the scene at or after `frame`
+        by `delta` frames.
+
+        See RippleCurves for the filter options.
+    """
+
+    filtered = getRippleCurves()
+    filtered.setOptions(skipLocked, skipReferenced, excludeNamespaces)
+    return rippleCurves(filtered.curves(), frame, delta, chunkSize)
@@ -0,0 +1,593 @@
+"""
+aweSmartTangentsLib.py
+Author: AwesomeAD
+
+Python engine behind aweSmartTangents.mel.
+
+Instead of querying and editing every key with its own keyframe/keyTangent
+command, all key values of a curve are fetched with a single query, every key
+is classified in one pass (see aweKeyRules) and tangents are applied with one
+keyTangent edit per tangent type.
+
+All tools share a CurveSnapshot (see getSnapshot()) holding the filtered list
+of animCurves and their key data. Callbacks keep track of edited, added,
+removed and renamed curves, so running several tools back to back only
+re-reads the curves that changed in between.
+
+Usage in Maya (normally called from the aweSmartTangents UI):
+import aweSmartTangentsLib
+aweSmartTangentsLib.smartTangents(tolerance=0.1)
+"""
+
+
+import fnmatch
+import functools
+import time
+import maya.cmds as cmds
+import maya.mel as mel
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
+import aweKeyRules
+import aweMayaUtils
+
+
+# curves matching these names are never touched (armask settings)
+EXCLUDED_CURVES = ['armask*']
+# number of curves processed at a time
+CHUNK_SIZE = 500
+# curves whose values stay within this range count as static
+STATIC_TOLERANCE = 0.0001
+# index of the middle axis for each rotateOrder (xyz, yzx, zxy, xzy, yxz, zyx)
+MIDDLE_AXIS = [1, 2, 0, 2, 0, 1]
+ROTATE_AXES = {'rotateX': 0, 'rotateY': 1, 'rotateZ': 2}
+
+
+def listCurves():
+    """ List all time based animCurves in the scene, minus excluded ones. """
+
+    curves = cmds.ls(type=aweMayaUtils.TIME_CURVE_TYPES) or []
+    return [c for c in curves if not any(fnmatch.fnmatchcase(c, p) for p in EXCLUDED_CURVES)]
+
+
+class CurveSnapshot(object):
+    """ Cached list of the scene's animCurves and their key arrays.
+
+        The curve list is the one returned by listCurves(). Key data is read
+        per curve and per array (times, values, inAngles, outAngles) when first
+        asked for, with a single query each, and kept until the curve changes.
+        Edits, undo/redo, new/removed/renamed curves and scene changes are
+        tracked with API callbacks; tools that edit curves themselves also call
+        invalidate() so the next read doesn't depend on callback timing.
+    """
+
+    queries = {
+        'times': lambda c: cmds.keyframe(c, q=True, timeChange=True),
+        'values': lambda c: cmds.keyframe(c, q=True, valueChange=True),
+        'inAngles': lambda c: cmds.keyTangent(c, q=True, inAngle=True),
+        'outAngles': lambda c: cmds.keyTangent(c, q=True, outAngle=True),
+    }
+
+    def __init__(self):
+        self._curves = None
+        self._data = {}
+        self._callbacks = []
+        self.reads = 0
+        self.hits = 0
+
+    def curves(self):
+        """ Return the filtered list of animCurves in the scene. """
+
+        if self._curves is None:
+            self._curves = listCurves()
+        return list(self._curves)
+
+    def get(self, curve, key):
+        """ Return one of the key arrays of `curve` (see CurveSnapshot.queries). """
+
+        data = self._data.setdefault(curve, {})
+        if key in data:
+            self.hits += 1
+        else:
+            data[key] = self.queries[key](curve) or []
+            self.reads += 1
+        return data[key]
+
+    def values(self, curve):
+        return self.get(curve, 'values')
+
+    def keyData(self, curve):
+        """ Return key times, values, in and out tangent angles of `curve`. """
+
+        return tuple(self.get(curve, key) for key in ('times', 'values', 'inAngles', 'outAngles'))
+
+    def invalidate(self, curves=None):
+        """ Forget the key data of `curves` (or of all curves). """
+
+        if curves is None:
+            self._data = {}
+        else:
+            for curve in curves:
+                self._data.pop(curve, None)
+
+    def reset(self):
+        """ Forget everything, including the curve list. """
+
+        self._curves = None
+        self._data = {}
+
+    def install(self):
+        """ Register the callbacks that keep the snapshot up to date. """
+
+        if self._callbacks:
+            return
+        self._callbacks = [
+            oma.MAnimMessage.addAnimCurveEditedCallback(self._curvesEdited),
+            om.MDGMessage.addNodeAddedCallback(self._curveAdded, 'animCurve'),
+            om.MDGMessage.addNodeRemovedCallback(self._curveRemoved, 'animCurve'),
+            om.MNodeMessage.addNameChangedCallback(om.MObject(), self._nameChanged),
+            om.MEventMessage.addEventCallback('Undo', self._undone),
+            om.MEventMessage.addEventCallback('Redo', self._undone),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeNew, self._sceneChanged),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeOpen, self._sceneChanged),
+        ]
+
+    def uninstall(self):
+        om.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+        self.reset()
+
+    def _curvesEdited(self, curves, *args):
+        for i in range(len(curves)):
+            self._data.pop(om.MFnDependencyNode(curves[i]).name(), None)
+
+    def _curveAdded(self, node, *args):
+        self._curves = None
+
+    def _curveRemoved(self, node, *args):
+        self._curves = None
+        self._data.pop(om.MFnDependencyNode(node).name(), None)
+
+    def _nameChanged(self, node, previousName, *args):
+        if node.hasFn(om.MFn.kAnimCurve):
+            self._curves = None
+            self._data.pop(previousName, None)
+
+    def _undone(self, *args):
+        self.invalidate()
+
+    def _sceneChanged(self, *args):
+        self.reset()
+
+
+_snapshot = None
+
+
+def getSnapshot():
+    """ Return the CurveSnapshot shared by all SmartTangents tools. """
+
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = CurveSnapshot()
+        _snapshot.install()
+    return _snapshot
+
+
+def applyTangentTypes(curve, types):
+    """ Set in and out tangents of each key of `curve` to the given types.
+
+        Keys are grouped by type, so this issues one keyTangent edit per type.
+    """
+
+    for tangentType, indices in aweKeyRules.groupIndices(types).items():
+        cmds.keyTangent(curve, e=True, index=indices, itt=tangentType, ott=tangentType)
+
+
+def writeChunk(curves, typeLists, unlockWeights=False):
+    """ Apply classified tangent types to a chunk of curves. """
+
+    for curve, types in zip(curves, typeLists):
+        if types:
+            applyTangentTypes(curve, types)
+    if unlockWeights:
+        keyedCurves = [c for c, types in zip(curves, typeLists) if types]
+        if keyedCurves:
+            cmds.keyTangent(keyedCurves, e=True, weightLock=False)
+
+
+def convertTangents(tangentType, selectionOnly=False, rangeOnly=False, chunkSize=CHUNK_SIZE):
+    """ Set in and out tangents of all keys to `tangentType`.
+
+        Keyword arguments:
+        selectionOnly : only convert curves of selected objects
+        rangeOnly     : only convert keys within the timeline's playback range
+        chunkSize     : number of curves edited by a single keyTangent command
+
+        Curves are listed and filtered (no driven keys) in one pass and edited in
+        large chunks. If a chunk fails, its curves are retried one by one and
+        failing curves are skipped, like the MEL version did with catchQuiet.
+    """
+
+    start = time.time()
+    snapshot = getSnapshot()
+    curves = listScopeCurves(2 if selectionOnly else 1)
+    if not curves:
+        return 0
+
+    flags = {'e': True, 'itt': tangentType, 'ott': tangentType}
+    if rangeOnly:
+        flags['time'] = (cmds.playbackOptions(q=True, min=True), cmds.playbackOptions(q=True, max=True))
+
+    converted = 0
+    cmds.undoInfo(openChunk=True)
+    try:
+        for i in range(0, len(curves), chunkSize):
+            chunk = curves[i:i + chunkSize]
+            try:
+                cmds.keyTangent(chunk, **flags)
+                converted += len(chunk)
+            except RuntimeError:
+                for curve in chunk:
+                    try:
+                        cmds.keyTangent(curve, **flags)
+                        converted += 1
+                    except RuntimeError:
+                        pass
+            snapshot.invalidate(chunk)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+    duration = time.time() - start
+    print("Converted %d curves to %s in %.2f seconds (%d curves per second).\n"
+          % (converted, tangentType, duration, converted / max(duration, 0.001)))
+    return converted
+
+
+def findStaticCurves(curves, tolerance=STATIC_TOLERANCE, valueLists=None):
+    """ Return the curves among `curves` whose values never change.
+
+        Values and tangent angles come from the shared snapshot. `valueLists`
+        can pass values that were already read (one list per curve); tangents
+        are then assumed to be flat wherever values are equal, which is the case
+        right after smartTangents() has run.
+    """
+
+    if valueLists is not None:
+        return [c for c, values in zip(curves, valueLists) if aweKeyRules.isStatic(values, tolerance)]
+
+    snapshot = getSnapshot()
+    static = []
+    for curve in curves:
+        values = snapshot.values(curve)
+        # only fetch tangents if the values qualify
+        if aweKeyRules.isStatic(values, tolerance) and \
+                aweKeyRules.isStatic(values, tolerance, snapshot.get(curve, 'inAngles'), snapshot.get(curve, 'outAngles')):
+            static.append(curve)
+    return static
+
+
+def deleteStaticCurves(curves, tolerance=STATIC_TOLERANCE, dryRun=False, valueLists=None):
+    """ Delete the static curves among `curves`.
+
+        The animated attributes keep their current value.
+        With `dryRun`, nothing is deleted and a report of the curves that would
+        be deleted, and the attributes they animate, is printed instead.
+        See findStaticCurves() for `valueLists`.
+        Returns the list of static curves.
+    """
+
+    static = findStaticCurves(curves, tolerance, valueLists)
+    if dryRun:
+        for curve in static:
+            plugs = cmds.listConnections(curve, s=False, d=True, plugs=True, skipConversionNodes=True) or []
+            print("%s -> %s" % (curve, ", ".join(plugs)))
+        print("Found %d static curves among %d curves (tolerance %g).\n" % (len(static), len(curves), tolerance))
+        return static
+
+    if static:
+        cmds.delete(static)
+        getSnapshot().reset()
+    print("Deleted %d static curves.\n" % len(static))
+    return static
+
+
+def mapRotationChannels(curves):
+    """ Group the rotation curves among `curves` by the object they animate.
+
+        Uses the actual connections rather than curve names, so renamed curves
+        are found as well. Returns {node: [curveX, curveY, curveZ]} with None for
+        channels that aren't animated by any of `curves`.
+    """
+
+    rotationCurves = cmds.ls(curves, type='animCurveTA') or []
+    if not rotationCurves:
+        return {}
+    pairs = cmds.listConnections(rotationCurves, s=False, d=True, plugs=True,
+                                 connections=True, skipConversionNodes=True) or []
+    channels = {}
+    for source, destination in zip(pairs[::2], pairs[1::2]):
+        node, attribute = destination.split('.', 1)
+        if attribute in ROTATE_AXES:
+            channels.setdefault(node, [None, None, None])[ROTATE_AXES[attribute]] = source.split('.')[0]
+    return channels
+
+
+def writeValues(curve, oldValues, newValues, flipped=None):
+    """ Change key values of `curve` from `oldValues` to `newValues`.
+
+        Keys are grouped by the edit they need: keys shifted by the same amount
+        are moved with one relative keyframe edit, keys flagged in `flipped` are
+        mirrored (tangents included) with one scaleKey per mirror value.
+    """
+
+    offsets = {}
+    mirrors = {}
+    for i, (old, new) in enumerate(zip(oldValues, newValues)):
+        if flipped and flipped[i]:
+            mirrors.setdefault(round(new + old, 6), []).append(i)
+        elif abs(new - old) > 1e-6:
+            offsets.setdefault(round(new - old, 6), []).append(i)
+    for delta, indices in offsets.items():
+        cmds.keyframe(curve, e=True, index=aweKeyRules.indexRanges(indices), relative=True, valueChange=delta)
+    for total, indices in mirrors.items():
+        cmds.scaleKey(curve, index=aweKeyRules.indexRanges(indices), valueScale=-1, valuePivot=total / 2.0)
+
+
+def eulerFilterCurves(curves):
+    """ Euler filter the rotation curves among `curves`.
+
+        Channels are grouped into XYZ triples per object. If all three channels
+        of an object are keyed on the same frames, they're filtered together
+        (taking the object's rotate order into account), otherwise each channel
+        only has its 360 degree jumps removed.
+        Returns the list of filtered curves.
+    """
+
+    return filterRotationChannels(mapRotationChannels(curves).items())
+
+
+def filterRotationChannels(channels):
+    """ Euler filter (node, [curveX, curveY, curveZ]) pairs as returned by
+        mapRotationChannels(); see eulerFilterCurves().
+    """
+
+    snapshot = getSnapshot()
+    filteredCurves = []
+    for node, triple in channels:
+        present = [c for c in triple if c]
+        valueLists = [snapshot.values(c) for c in present]
+        times = [snapshot.get(c, 'times') for c in present]
+        if len(present) == 3 and times[0] == times[1] == times[2]:
+            rotateOrder = cmds.getAttr(node + '.rotateOrder') if cmds.attributeQuery('rotateOrder', node=node, exists=True) else 0
+            rotations, flipped = aweKeyRules.eulerFilter(list(zip(*valueLists)), MIDDLE_AXIS[rotateOrder])
+            newValueLists = [list(v) for v in zip(*rotations)]
+            flags = [flipped if axis == MIDDLE_AXIS[rotateOrder] else None for axis in range(3)]
+        else:
+            newValueLists = [aweKeyRules.unwrapAngles(v) for v in valueLists]
+            flags = [None] * len(present)
+        for curve, oldValues, newValues, flipFlags in zip(present, valueLists, newValueLists, flags):
+            writeValues(curve, oldValues, newValues, flipFlags)
+        snapshot.invalidate(present)
+        filteredCurves.extend(present)
+    return filteredCurves
+
+
+def smartTangents(unlockWeights=False, eulerFilter=False, deleteStatic=False, tolerance=0.1,
+                  chunkSize=CHUNK_SIZE, pool=None):
+    """ Set tangents of all animCurves in the scene in a senseful way.
+
+        Keyword arguments:
+        unlockWeights : unlock weights of weighted tangents
+        eulerFilter   : perform an euler filter on rotation channels
+        deleteStatic  : delete static channels afterwards (among the processed curves,
+                        using the values read for the tangents)
+        tolerance     : consider key values equal if difference lower than this
+        chunkSize     : number of curves read, classified and written at a time
+        pool          : optional multiprocessing pool to classify chunks in
+                        (only useful in mayapy; Maya's UI session can't spawn
+                        worker processes reliably)
+
+        The curves are processed in chunks: rotation curves are euler filtered
+        a chunk of objects at a time, key values of all chunks are read,
+        then classified (which needs no Maya commands at all), then written
+        back chunk by chunk. Progress and interruption are handled per chunk,
+        and the whole edit is a single undo step.
+    """
+
+    snapshot = getSnapshot()
+    curves = snapshot.curves()
+    if not curves:
+        print("There are no animation curves in the scene. Please do some awesome animation first! \n")
+        return
+
+    chunks = [curves[i:i + chunkSize] for i in range(0, len(curves), chunkSize)]
+    # up to three rotation curves per object
+    rotationChunks = []
+    if eulerFilter:
+        channels = list(mapRotationChannels(curves).items())
+        objectCount = max(1, chunkSize // 3)
+        rotationChunks = [channels[i:i + objectCount] for i in range(0, len(channels), objectCount)]
+
+    gMainProgressBar = aweMayaUtils.mainProgressBar()
+    cmds.progressBar(gMainProgressBar, e=True, beginProgress=True, isInterruptable=True,
+                     status="Reading %d curves" % len(curves), maxValue=len(chunks) * 2 + len(rotationChunks))
+
+    totalKeys = 0
+    curvesDone = 0
+    cancelled = False
+    cmds.undoInfo(openChunk=True)
+    try:
+        # euler filter
+        if rotationChunks:
+            cmds.progressBar(gMainProgressBar, e=True, status="Filtering rotations")
+        for rotationChunk in rotationChunks:
+            if cmds.progressBar(gMainProgressBar, q=True, isCancelled=True):
+                cancelled = True
+                break
+            filterRotationChannels(rotationChunk)
+            cmds.progressBar(gMainProgressBar, e=True, step=1)
+        if rotationChunks:
+            cmds.progressBar(gMainProgressBar, e=True, status="Reading %d curves" % len(curves))
+
+        # read
+        valueLists = []
+        for chunk in chunks:
+            if cancelled or cmds.progressBar(gMainProgressBar, q=True, isCancelled=True):
+                cancelled = True
+                break
+            valueLists.append([snapshot.values(c) for c in chunk])
+            cmds.progressBar(gMainProgressBar, e=True, step=1)
+
+        if not cancelled:
+            # classify
+            cmds.progressBar(gMainProgressBar, e=True, status="Applying Awesomeness to your tangents")
+            classify = functools.partial(aweKeyRules.classifyCurves, tolerance=tolerance)
+            typeLists = pool.map(classify, valueLists) if pool else [classify(v) for v in valueLists]
+
+            # write; no need to redraw the viewport after every chunk
+            cmds.refresh(suspend=True)
+            try:
+                for chunk, values, types in zip(chunks, valueLists, typeLists):
+                    if cmds.progressBar(gMainProgressBar, q=True, isCancelled=True):
+                        cancelled = True
+                        break
+                    writeChunk(chunk, types, unlockWeights)
+                    snapshot.invalidate(chunk)
+                    totalKeys += sum(len(v) for v in values)
+                    curvesDone += len(chunk)
+                    cmds.progressBar(gMainProgressBar, e=True, step=1)
+            finally:
+                cmds.refresh(suspend=False)
+
+        if deleteStatic and not cancelled:
+            processed = [c for chunk in chunks for c in chunk]
+            deleteStaticCurves(processed, min(tolerance, STATIC_TOLERANCE),
+                               valueLists=[values for chunkValues in valueLists for values in chunkValues])
+    finally:
+        cmds.undoInfo(closeChunk=True)
+        cmds.progressBar(gMainProgressBar, e=True, endProgress=True)
+
+    if cancelled:
+        print("Interrupted after smartening %d keys on %d of %d curves.\n" % (totalKeys, curvesDone, len(curves)))
+        return
+
+    stati = []
+    if unlockWeights:
+        stati.append("tangent weights unlocked")
+    if eulerFilter:
+        stati.append("euler filter applied")
+    if deleteStatic:
+        stati.append("static channels deleted")
+    statusString = " (" + ", ".join(stati) + ")." if stati else "."
+    print("Successfully smartened %d keys on %d curves%s Awesome! \n" % (totalKeys, len(curves), statusString))
+
+
+def listScopeCurves(scope):
+    """ List the time based animCurves for the given scope.
+
+        1 = scene, 2 = selected objects, 3 = attributes selected in the channel box
+    """
+
+    if scope == 1:
+        return getSnapshot().curves()
+    elif scope == 2:
+        curves = cmds.listConnections(type='animCurve') or []
+    else:
+        channelBox = mel.eval("global string $gChannelBoxName; $tmp = $gChannelBoxName")
+        attributes = cmds.channelBox(channelBox, q=True, selectedMainAttributes=True) or []
+        plugs = ["%s.%s" % (obj, attr) for obj in cmds.ls(sl=True) or [] for attr in attributes]
+        curves = []
+        for plug in plugs:
+            curves.extend(cmds.listConnections(plug, d=True, type='animCurve') or [])
+    # no driven keys, no duplicates
+    return cmds.ls(curves, type=aweMayaUtils.TIME_CURVE_TYPES) or []
+
+
+def mapDrivenNodes(curves):
+    """ Return {curve: node} for the nodes animated by `curves`, using a single query. """
+
+    pairs = cmds.listConnections(curves, s=False, d=True, connections=True, skipConversionNodes=True) or []
+    drivenNodes = {}
+    for plug, node in zip(pairs[::2], pairs[1::2]):
+        drivenNodes.setdefault(plug.split('.')[0], node)
+    return drivenNodes
+
+
+def nodeCurves(node):
+    """ Return all time based animCurves animating `node`. """
+
+    curves = cmds.listConnections(node, s=True, d=False, type='animCurve', skipConversionNodes=True) or []
+    return cmds.ls(curves, type=aweMayaUtils.TIME_CURVE_TYPES) or []
+
+
+def deleteRedundantKeys(scope=1, mode=2, tolerance=0.0001):
+    """ Delete keys inside runs of held values.
+
+        Keyword arguments:
+        scope     : 1 = scene, 2 = selection, 3 = channel box
+        mode      : what to do with a redundant key if other attributes of the same
+                    object have non-redundant keys on that frame
+                    1 = leave key, 2 = delete key
+        tolerance : consider key values equal if difference lower than this
+
+        Returns the number of deleted keys.
+    """
+
+    snapshot = getSnapshot()
+    curves = listScopeCurves(scope)
+    if not curves:
+        print("There are no animation curves to operate on\n")
+        return 0
+
+    # key data and redundant indices per curve, filled on demand
+    # (with mode 1, curves of other attributes are needed as well)
+    redundant = {}
+    keyTimes = {}
+
+    def analyze(curve):
+        if curve not in redundant:
+            times, values, inAngles, outAngles = snapshot.keyData(curve)
+            keyTimes[curve] = times
+            redundant[curve] = aweKeyRules.redundantKeys(values, tolerance, inAngles, outAngles)
+        return redundant[curve]
+
+    if mode == 1:
+        # index of the frames that carry non-redundant keys on any curve of an object,
+        # built in one pass over the objects; deciding whether a redundant key has
+        # to stay is then a single set lookup
+        drivenNodes = mapDrivenNodes(curves)
+        objectFrames = {}
+        for node in set(drivenNodes.values()):
+            frames = set()
+            for curve in nodeCurves(node):
+                indices = analyze(curve)
+                frames.update(aweKeyRules.keptFrames(keyTimes[curve], indices))
+            objectFrames[node] = frames
+
+    pb = "aweSTProgressBar"
+    if cmds.progressBar(pb, exists=True):
+        cmds.progressBar(pb, e=True, progress=0, minValue=0, maxValue=len(curves))
+
+    keysDeleted = 0
+    cmds.undoInfo(openChunk=True)
+    try:
+        for n, curve in enumerate(curves):
+            indices = analyze(curve)
+            if indices and mode == 1:
+                # a curve's own kept frames never contain its redundant keys,
+                # so the object's index can be used as is
+                frames = objectFrames.get(drivenNodes.get(curve), ())
+                times = keyTimes[curve]
+                indices = [i for i in indices if times[i] not in frames]
+            if indices:
+                cmds.cutKey(curve, index=aweKeyRules.indexRanges(indices), clear=True)
+                snapshot.invalidate([curve])
+                keysDeleted += len(indices)
+            if n % 100 == 0 and cmds.progressBar(pb, exists=True):
+                cmds.progressBar(pb, e=True, progress=n)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+        if cmds.progressBar(pb, exists=True):
+            cmds.progressBar(pb, e=True, progress=0)
+
+    print("Cleaned up %d redundant keys. Awesome!\n" % keysDeleted)
+    return keysDeleted
@@ -0,0 +1,274 @@
+"""
+aweVtxPosLib.py
+Author: AwesomeAD
+
+Python engine behind aweVtxPosHUD.mel.
+
+The HUD is updated on every viewport refresh, so the selected vertex positions
+are read with the API instead of one xform query per vertex: large selections
+with one getPoints call per mesh, small ones vertex by vertex so the cost
+doesn't depend on the size of the mesh. Min/max are found in a single pass
+over the points.
+
+Besides the position, the HUD can show stats of the selection (centroid,
+bounding box size and vertex count, see MODE_OPTION). Above a vertex count
+(SAMPLE_OPTION) the stats are estimated from an even sample of the vertices,
+so the display stays interactive.
+
+On top of that the HUD text is cached (see HUDCache) and only recomputed
+after the selection changed, the time changed or a selected mesh got dirty,
+so tumbling the camera costs nothing.
+
+Usage in Maya (normally called from the aweVtxPos HUD command):
+import aweVtxPosLib
+aweVtxPosLib.vertexPosition()
+print(aweVtxPosLib.getHUDCache().report())
+"""
+
+
+import maya.cmds as cmds
+import maya.api.OpenMaya as om
+
+
+NONE_SELECTED = "None Selected"
+
+# optionVar holding the HUD mode: "position" (default) or "stats"
+MODE_OPTION = "aweVtxPosHUDMode"
+# optionVar holding the vertex count above which stats are sampled
+SAMPLE_OPTION = "aweVtxPosHUDSampleLimit"
+SAMPLE_LIMIT = 20000
+# selections smaller than 1/BULK_RATIO of a mesh are read vertex by vertex;
+# a single getPoint call costs roughly as much as copying this many points
+BULK_RATIO = 20
+
+
+def selectedVertices():
+    """ Return [(dagPath, [vertex indices]), ...] for the selected mesh vertices.
+
+        Components selected on the same mesh are merged into one entry.
+    """
+
+    selection = om.MGlobal.getActiveSelectionList()
+    meshes = []
+    byMesh = {}
+    for i in range(selection.length()):
+        try:
+            dagPath, component = selection.getComponent(i)
+        except (RuntimeError, TypeError):
+            # DG nodes (shaders, animCurves, sets...) have no dag path
+            continue
+        if component.isNull() or not component.hasFn(om.MFn.kMeshVertComponent):
+            continue
+        indices = om.MFnSingleIndexedComponent(component).getElements()
+        if not len(indices):
+            continue
+        name = dagPath.fullPathName()
+        if name in byMesh:
+            byMesh[name].extend(indices)
+        else:
+            byMesh[name] = list(indices)
+            meshes.append((dagPath, byMesh[name]))
+    return meshes
+
+
+def selectedPoints(meshes=None, stride=1):
+    """ Return the world space positions of the selected vertices, one list per mesh.
+
+        The evaluated (deformed) points are used. If a large part of a mesh is
+        selected, all its points are fetched with a single call, otherwise only
+        the selected ones are (see BULK_RATIO).
+        `meshes`: result of selectedVertices(), if already at hand
+        `stride`: only return every n-th selected vertex of each mesh
+    """
+
+    pointLists = []
+    for dagPath, indices in selectedVertices() if meshes is None else meshes:
+        fnMesh = om.MFnMesh(dagPath)
+        wanted = [indices[j] for j in range(0, len(indices), stride)]
+        if len(wanted) * BULK_RATIO < fnMesh.numVertices:
+            pointLists.append([fnMesh.getPoint(i, om.MSpace.kWorld) for i in wanted])
+        else:
+            points = fnMesh.getPoints(om.MSpace.kWorld)
+            pointLists.append([points[i] for i in wanted])
+    return pointLists
+
+
+def boundingBoxCenter(pointLists):
+    """ Return the center of the bounding box of all points, found in one pass. """
+
+    low = [float('inf')] * 3
+    high = [float('-inf')] * 3
+    for points in pointLists:
+        for point in points:
+            for axis in range(3):
+                value = point[axis]
+                if value < low[axis]:
+                    low[axis] = value
+                if value > high[axis]:
+                    high[axis] = value
+    return [(low[axis] + high[axis]) / 2.0 for axis in range(3)]
+
+
+def pointStats(pointLists):
+    """ Return centroid, bounding box size and count of all points, found in one pass. """
+
+    total = [0.0] * 3
+    low = [float('inf')] * 3
+    high = [float('-inf')] * 3
+    count = 0
+    for points in pointLists:
+        count += len(points)
+        for point in points:
+            for axis in range(3):
+                value = point[axis]
+                total[axis] += value
+                if value < low[axis]:
+                    low[axis] = value
+                if value > high[axis]:
+                    high[axis] = value
+    if not count:
+        return None, None, 0
+    return [t / count for t in total], [high[axis] - low[axis] for axis in range(3)], count
+
+
+def formatValue(value):
+    """ Truncate `value` to 3 decimals and print it the way MEL prints floats. """
+
+    text = "%.3f" % (int(value * 1000) / 1000.0)
+    text = text.rstrip('0').rstrip('.')
+    return "0" if text == "-0" else text
+
+
+def formatPosition(position):
+    return "X: %s  Y: %s  Z: %s" % tuple(formatValue(v) for v in position)
+
+
+def formatStats(centroid, size, count, sampled=False):
+    text = "C: %s %s %s  Size: %s %s %s  Count: %d" % (
+        tuple(formatValue(v) for v in centroid) + tuple(formatValue(v) for v in size) + (count,))
+    return "~" + text if sampled else text
+
+
+def vertexStats(meshes=None):
+    """ Return the stats text for the selected vertices.
+
+        Above the sample limit only an even sample of the vertices of every
+        mesh is looked at; the text is prefixed with "~" then.
+    """
+
+    if meshes is None:
+        meshes = selectedVertices()
+    count = sum(len(indices) for dagPath, indices in meshes)
+    if not count:
+        return NONE_SELECTED
+    limit = cmds.optionVar(q=SAMPLE_OPTION) if cmds.optionVar(exists=SAMPLE_OPTION) else SAMPLE_LIMIT
+    stride = max(1, -(-count // limit)) if limit > 0 else 1
+    centroid, size = pointStats(selectedPoints(meshes, stride))[:2]
+    return formatStats(centroid, size, count, stride > 1)
+
+
+def vertexPosition():
+    """ Return the HUD text for the selected vertices (cached, see HUDCache). """
+
+    return getHUDCache().get()
+
+
+def computeVertexPosition(meshes=None):
+    """ Compute the HUD text for the selected vertices.
+
+        A single vertex shows its world position, several vertices show the
+        center of their bounding box. In stats mode see vertexStats().
+    """
+
+    if not cmds.selectType(q=True, vertex=True):
+        return NONE_SELECTED
+    if cmds.optionVar(exists=MODE_OPTION) and cmds.optionVar(q=MODE_OPTION) == "stats":
+        return vertexStats(meshes)
+    pointLists = selectedPoints(meshes)
+    if not pointLists:
+        return NONE_SELECTED
+    return formatPosition(boundingBoxCenter(pointLists))
+
+
+class HUDCache(object):
+    """ Cached HUD text for vertexPosition().
+
+        The text is recomputed only when callbacks report that the selection,
+        the select type or the current time changed, or that one of the
+        selected meshes (or its transforms) changed. `recomputes` and `hits`
+        count how often the text was computed and served from the cache.
+    """
+
+    def __init__(self):
+        self.text = None
+        self.recomputes = 0
+        self.hits = 0
+        self._callbacks = []
+        self._meshCallbacks = []
+
+    def get(self):
+        """ Return the HUD text, recomputing it if it's out of date. """
+
+        if self.text is None:
+            meshes = selectedVertices() if cmds.selectType(q=True, vertex=True) else []
+            self.text = computeVertexPosition(meshes)
+            self.recomputes += 1
+            self._watchMeshes(meshes)
+        else:
+            self.hits += 1
+        return self.text
+
+    def invalidate(self, *args):
+        self.text = None
+
+    def report(self):
+        return "%d recomputes, %d cache hits" % (self.recomputes, self.hits)
+
+    def install(self):
+        """ Register the callbacks that invalidate the cached text. """
+
+        if self._callbacks:
+            return
+        self._callbacks = [om.MEventMessage.addEventCallback(event, self.invalidate)
+                           for event in ('SelectionChanged', 'SelectTypeChanged', 'timeChanged')]
+        self._callbacks += [
+            om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeNew, self.invalidate),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeOpen, self.invalidate),
+        ]
+
+    def uninstall(self):
+        om.MMessage.removeCallbacks(self._callbacks + self._meshCallbacks)
+        self._callbacks = []
+        self._meshCallbacks = []
+        self.text = None
+
+    def _watchMeshes(self, meshes):
+        """ Watch the selected meshes for edits and deformation. """
+
+        om.MMessage.removeCallbacks(self._meshCallbacks)
+        self._meshCallbacks = []
+        for dagPath, indices in meshes:
+            self._meshCallbacks.append(om.MNodeMessage.addNodeDirtyCallback(dagPath.node(), self.invalidate))
+            self._meshCallbacks.append(om.MDagMessage.addWorldMatrixModifiedCallback(dagPath, self.invalidate))
+
+
+_hudCache = None
+
+
+def getHUDCache():
+    """ Return the HUDCache used by the HUD. """
+
+    global _hudCache
+    if _hudCache is None:
+        _hudCache = HUDCache()
+        _hudCache.install()
+    return _hudCache
+
+
+def releaseHUDCache():
+    """ Remove the callbacks of the HUD cache (when the HUD is removed). """
+
+    global _hudCache
+    if _hudCache is not None:
+        _hudCache.uninstall()
+        _hudCache = None
@@ -0,0 +1,104 @@
+"""
+Tests for aweKeyRules; plain Python, no Maya needed:
+
+    python -m pytest Maya/test_aweKeyRules.py
+"""
+
+import pytest
+
+import aweKeyRules
+from aweKeyRules import FLAT, SPLINE
+
+
+@pytest.mark.parametrize("values, tolerance, expected", [
+    ([], 0.1, []),
+    ([5.0], 0.1, [FLAT]),
+    ([1.0, 1.0], 0.1, [FLAT, FLAT]),
+    ([0.0, 1.0], 0.1, [SPLINE, SPLINE]),
+    # first and last key are flat if equal to their neighbour within tolerance
+    ([0.0, 0.05, 1.0], 0.1, [FLAT, FLAT, SPLINE]),
+    ([0.0, 0.95, 1.0], 0.1, [SPLINE, FLAT, FLAT]),
+    # extremes
+    ([0.0, 5.0, 0.0], 0.1, [SPLINE, FLAT, SPLINE]),
+    ([3.0, 1.0, 3.0, 1.0, 3.0], 0.1, [SPLINE, FLAT, FLAT, FLAT, SPLINE]),
+    # inbetweens
+    ([0.0, 1.0, 2.0], 0.1, [SPLINE, SPLINE, SPLINE]),
+    # near-equal neighbours use the tolerance on both sides
+    ([0.0, 1.0, 1.05, 2.0], 0.01, [SPLINE, SPLINE, SPLINE, SPLINE]),
+    ([0.0, 1.0, 1.05, 2.0], 0.1, [SPLINE, FLAT, FLAT, SPLINE]),
+])
+def test_classifyKeys(values, tolerance, expected):
+    assert aweKeyRules.classifyKeys(values, tolerance) == expected
+
+
+def test_classifyCurves():
+    assert aweKeyRules.classifyCurves([[0.0, 5.0, 0.0], [1.0]], 0.1) == [[SPLINE, FLAT, SPLINE], [FLAT]]
+
+
+@pytest.mark.parametrize("types, expected", [
+    ([], {}),
+    ([FLAT], {FLAT: [(0, 0)]}),
+    ([FLAT, FLAT, SPLINE, FLAT], {FLAT: [(0, 1), (3, 3)], SPLINE: [(2, 2)]}),
+    ([SPLINE, SPLINE, SPLINE], {SPLINE: [(0, 2)]}),
+])
+def test_groupIndices(types, expected):
+    assert aweKeyRules.groupIndices(types) == expected
+
+
+@pytest.mark.parametrize("indices, expected", [
+    ([], []),
+    ([4], [(4, 4)]),
+    ([0, 1, 2, 5, 7, 8], [(0, 2), (5, 5), (7, 8)]),
+])
+def test_indexRanges(indices, expected):
+    assert aweKeyRules.indexRanges(indices) == expected
+
+
+def test_redundantKeys_angles():
+    values = [1.0, 1.0, 1.0]
+    assert aweKeyRules.redundantKeys(values) == [1]
+    # the curve overshoots after the middle key, so it isn't held
+    assert aweKeyRules.redundantKeys(values, inAngles=[0.0, 0.0, 0.0], outAngles=[0.0, 5.0, 0.0]) == []
+
+
+def test_keptFrames():
+    assert aweKeyRules.keptFrames([1.0, 2.0, 3.0, 4.0], [1, 2]) == set([1.0, 4.0])
+
+
+@pytest.mark.parametrize("values, tolerance, inAngles, outAngles, expected", [
+    ([], 0.0, None, None, False),
+    ([1.0, 1.0], 0.0, None, None, True),
+    ([1.0, 1.00001], 0.0001, None, None, True),
+    ([1.0, 2.0], 0.0001, None, None, False),
+    ([1.0, 1.0], 0.0, [0.0, 0.0], [0.0, 0.0], True),
+    ([1.0, 1.0], 0.0, [0.0, 0.0], [10.0, 0.0], False),
+])
+def test_isStatic(values, tolerance, inAngles, outAngles, expected):
+    assert aweKeyRules.isStatic(values, tolerance, inAngles, outAngles) == expected
+
+
+def test_unwrapAngles():
+    assert aweKeyRules.unwrapAngles([]) == []
+    assert aweKeyRules.unwrapAngles([170.0, -170.0, 190.0, 550.0]) == [170.0, 190.0, 190.0, 190.0]
+
+
+def test_eulerFilter():
+    assert aweKeyRules.eulerFilter([]) == ([], [])
+    rotations = [(0.0, 0.0, 0.0), (10.0, 80.0, 0.0), (-170.0, 100.0, -180.0), (-160.0, 80.0, -170.0)]
+    filtered, flipped = aweKeyRules.eulerFilter(rotations)
+    assert filtered == [(0.0, 0.0, 0.0), (10.0, 80.0, 0.0), (10.0, 80.0, 0.0), (20.0, 100.0, 10.0)]
+    assert flipped == [False, False, True, True]
+
+
+def test_eulerFilter_middleAxis():
+    # for zxy the middle axis is x, so that one is mirrored
+    filtered, flipped = aweKeyRules.eulerFilter([(10.0, 0.0, 0.0), (170.0, 180.0, 180.0)], middleAxis=0)
+    assert filtered == [(10.0, 0.0, 0.0), (10.0, 0.0, 0.0)]
+    assert flipped == [False, True]
+
+
+@pytest.mark.parametrize("name, values, types, redundant", aweKeyRules.REFERENCE_CURVES,
+                         ids=[c[0] for c in aweKeyRules.REFERENCE_CURVES])
+def test_referenceCurves(name, values, types, redundant):
+    assert aweKeyRules.classifyKeys(values, aweKeyRules.REFERENCE_TOLERANCE) == types
+    assert aweKeyRules.redundantKeys(values, aweKeyRules.REFERENCE_TOLERANCE) == redundant
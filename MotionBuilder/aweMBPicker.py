@@ -7,20 +7,95 @@
 
 from pyfbsdk import *
 import pyfbsdk_additions as pyui
-from PySide import QtGui
+from PySide import QtGui, QtCore
+from contextlib import contextmanager
+from functools import wraps
+from timeit import default_timer
+import json
+
+# log levels; messages below gLogLevel are dropped before they are built
+LOG_DEBUG = 10
+LOG_INFO = 20
+LOG_WARNING = 30
+LOG_OFF = 100
+gLogLevel = LOG_WARNING
+# keep a fixed pool of rows and rebind them to Pickers while scrolling
+# instead of building a row for every Picker (for scenes with lots of Pickers)
+gVirtualizedList = False
+# version of the file format written by exportPickers()
+gPickerFileVersion = 1
+# the tool instance; stays None when the module is used without UI (batch jobs)
+awePickerTool = None
+
+def log(*messages, **kwargs):
+	'''Wrapper around print statement to control script output
+
+	Messages are debug output unless a level is passed, e.g.
+	log("something happened", level=LOG_INFO). Messages of levels below
+	gLogLevel return right away without converting anything to strings.
+	'''
+
+	if kwargs.get("level", LOG_DEBUG) < gLogLevel:
+		return
+	print " ".join(str(m) for m in messages)
+
+
+def setLogLevel(level):
+	'''Sets the level of script output, e.g. setLogLevel(LOG_DEBUG)'''
+
+	global gLogLevel
+	gLogLevel = level
+
+
+class Stats(object):
+	'''Counters and timers for profiling the tool
+
+	Query from the Python console:
+		aweMBPicker.gStats.report()
+		aweMBPicker.gStats.reset()
+	'''
+
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		self.counters = {}
+		self.timers = {}
 
-gDeveloperMode = True
+	def count(self, name, amount=1):
+		self.counters[name] = self.counters.get(name, 0) + amount
 
-def log(*messages):
-	'''Wrapper around print statement to control script output'''
+	def addTime(self, name, seconds):
+		calls, total, longest = self.timers.get(name, (0, 0.0, 0.0))
+		self.timers[name] = (calls + 1, total + seconds, max(longest, seconds))
 
-	if gDeveloperMode:
-		message = ""
-		for m in range(len(messages)):
-			bit = str(messages[m])
-			sep = " " if m else ""
-			message += sep + bit
-		print message
+	def report(self):
+		'''Prints all counters and timers and returns them as a dict'''
+
+		for name in sorted(self.counters):
+			print "%-20s %d" % (name, self.counters[name])
+		for name in sorted(self.timers):
+			calls, total, longest = self.timers[name]
+			print "%-20s %d calls, %.3f ms avg, %.3f ms max" % (name, calls, total / calls * 1000, longest * 1000)
+		return {"counters": dict(self.counters), "timers": dict(self.timers)}
+
+
+gStats = Stats()
+
+
+def timed(name):
+	'''Decorator that adds the run time of each call to gStats under name'''
+
+	def decorator(func):
+		@wraps(func)
+		def wrapper(*args, **kwargs):
+			start = default_timer()
+			try:
+				return func(*args, **kwargs)
+			finally:
+				gStats.addTime(name, default_timer() - start)
+		return wrapper
+	return decorator
 
 class Picker(object):
 	'''The internal Picker object
@@ -31,6 +106,7 @@ class Picker(object):
 	'''
 
 	def __init__(self, name="Picker", objectList=[],pickerObject=None, tab="Pickers"):
+		self._tab = tab
 		self.pickerObject = self.createPickerObject(name, tab, pickerObject, objectList)
 
 	@property
@@ -46,11 +122,13 @@ class Picker(object):
 
 	@property
 	def tab(self):
-	    return self.pickerObject.PropertyList.Find('Tab').Data
+		return self._tab
 	@tab.setter
 	def tab(self, value):
-	    self.pickerObject.PropertyList.Find('Tab').Data = value
-	    self.pickerObject.Tab = value
+		# the tab is defined by the tab set the pickerObject is connected to
+		gPickerRegistry.getTabSet(self._tab).DisconnectSrc(self.pickerObject)
+		gPickerRegistry.getTabSet(value).ConnectSrc(self.pickerObject)
+		self._tab = value
 	
 	@property
 	def objects(self):
@@ -60,6 +138,16 @@ class Picker(object):
 		self.pickerObject.PropertyList.Find('Objects').removeAll()
 		for o in objectList:
 			self.pickerObject.PropertyList.Find('Objects').append(o)
+
+	@property
+	def members(self):
+		'''The Picker's objects as a set
+
+		Read from the property every time (a single read), so objects that were
+		deleted or removed by an undo are never selected.
+		'''
+
+		return frozenset(self.objects)
 	
 
 	def createPickerObject(self, name, tab, pickerObject, objectList=[]):
@@ -72,21 +160,9 @@ class Picker(object):
 		po = pickerObject
 		if not po:
 			po = aweCreateSet(name)
-			# search for master set. If none found, create it.
-			masterSet = None
-			for s in FBSystem().Scene.Sets:
-				if s.LongName == "awe:Pickers":
-					masterSet = s
-			if not masterSet:
-				masterSet = aweCreateSet("awe:Pickers")
-			# search for the tab set. If none found, create it.
-			tabSet = None
-			for s in masterSet.Items:
-				if s.ClassName() == 'FBSet' and s.LongName == tab:
-					tabSet = s
-			if not tabSet:
-				tabSet = aweCreateSet(tab)
-				masterSet.ConnectSrc(tabSet)
+			# master and tab sets come from the registry's index;
+			# they are created there if they don't exist yet
+			tabSet = gPickerRegistry.getTabSet(tab)
 			tabSet.ConnectSrc(po)
 
 			po.PropertyCreate('PickerName', FBPropertyType.kFBPT_charptr, 'String', False, False, None)
@@ -95,7 +171,7 @@ class Picker(object):
 			po.Pickable = po.Transformable = False
 			for o in objectList:
 				po.PropertyList.Find('Objects').append(o)
-			po.picker = self
+		po.picker = self
 		po.OnUnbind.Add(_pickerObjectDestroyed)
 		return po
 
@@ -103,18 +179,13 @@ class Picker(object):
 		self.name = newName
 		return self.name
 
-	def select(self):
+	def select(self, mode="replace"):
 		'''Selects all objects associated with this Picker
+
+		See selectObjects() for the available modes.
 		'''
 		if self.pickerObject:
-			FBBeginChangeAllModels()
-			ml = FBModelList()
-			FBGetSelectedModels(ml)
-			for m in ml:
-				m.Selected = False
-			for o in self.objects:
-				o.Selected = True
-			FBEndChangeAllModels()
+			selectObjects(self.members, mode)
 			return True
 		else:
 			return False
@@ -135,6 +206,153 @@ class Picker(object):
 		self.objects = [o for o in tempSet]
 
 
+class PickerRegistry(object):
+	'''Name-keyed index of the sets that store Pickers in the Scene
+
+	Looking up the master set means walking FBSystem().Scene.Sets, which is
+	slow in scenes with thousands of sets. The registry does that walk once
+	per scene and keeps the master set and its tab sets by name, so creating
+	Pickers doesn't have to scan the Scene again.
+	'''
+
+	masterSetName = "awe:Pickers"
+
+	def __init__(self):
+		self.clear()
+
+	def clear(self):
+		'''Drops the index, e.g. before a new scene is loaded'''
+
+		self.masterSet = None
+		self.tabSets = {}
+		self.indexed = False
+
+	def build(self):
+		'''Indexes the master set and its tab sets in a single pass over the Scene'''
+
+		self.clear()
+		for s in FBSystem().Scene.Sets:
+			if s.LongName == self.masterSetName:
+				self.masterSet = s
+				break
+		if self.masterSet:
+			self._watch(self.masterSet)
+			for t in self.masterSet.Items:
+				if t.ClassName() == 'FBSet':
+					self.tabSets[t.LongName] = t
+					self._watch(t)
+		self.indexed = True
+
+	def getMasterSet(self):
+		'''Returns the master set. If none exists, it is created'''
+
+		if not self.indexed:
+			self.build()
+		if not self.masterSet:
+			self.masterSet = aweCreateSet(self.masterSetName)
+			self._watch(self.masterSet)
+		return self.masterSet
+
+	def getTabSet(self, tab):
+		'''Returns the tab set called tab. If none exists, it is created'''
+
+		masterSet = self.getMasterSet()
+		tabSet = self.tabSets.get(tab)
+		if not tabSet:
+			tabSet = aweCreateSet(tab)
+			masterSet.ConnectSrc(tabSet)
+			self.tabSets[tab] = tabSet
+			self._watch(tabSet)
+		return tabSet
+
+	def forget(self, setObject):
+		'''Removes a deleted set from the index'''
+
+		if setObject == self.masterSet:
+			# rescan on next access, the master set might come back with an undo
+			self.clear()
+			return
+		for name, tabSet in self.tabSets.items():
+			if tabSet == setObject:
+				del self.tabSets[name]
+
+	def _watch(self, setObject):
+		setObject.OnUnbind.Add(_indexedSetDestroyed)
+
+
+gPickerRegistry = PickerRegistry()
+
+
+def selectObjects(objects, mode="replace"):
+	'''Changes the selection in a single selection change
+
+	mode:
+		"replace"   select objects only
+		"add"       add objects to the current selection
+		"subtract"  remove objects from the current selection
+		"intersect" keep only the selected objects that are in objects
+
+	Only objects whose selection state actually changes are touched.
+	'''
+
+	ml = FBModelList()
+	FBGetSelectedModels(ml)
+	current = set(ml)
+	if mode == "add":
+		target = current.union(objects)
+	elif mode == "subtract":
+		target = current.difference(objects)
+	elif mode == "intersect":
+		target = current.intersection(objects)
+	else:
+		target = set(objects)
+	FBBeginChangeAllModels()
+	for m in current.difference(target):
+		m.Selected = False
+	for o in target.difference(current):
+		o.Selected = True
+	FBEndChangeAllModels()
+
+
+def selectPickers(pickers, mode="replace"):
+	'''Selects the combined objects of several Pickers as one selection change
+
+	Pickers without a pickerObject are skipped.
+	Returns False if any of them was skipped.
+	'''
+
+	objects = set()
+	success = True
+	for picker in pickers:
+		if picker.pickerObject:
+			objects.update(picker.members)
+		else:
+			success = False
+	selectObjects(objects, mode)
+	return success
+
+
+def selectTab(tool, tab, mode="replace"):
+	'''Selects the objects of all Pickers in a tab'''
+
+	return selectPickers([p for p in tool.pickers if p.tab == tab], mode)
+
+
+def _selectionMode():
+	'''Maps the keyboard modifiers held during a click to a selection mode'''
+
+	modifiers = QtGui.QApplication.keyboardModifiers()
+	shift = bool(modifiers & QtCore.Qt.ShiftModifier)
+	ctrl = bool(modifiers & QtCore.Qt.ControlModifier)
+	if shift and ctrl:
+		return "intersect"
+	if shift:
+		return "add"
+	if ctrl:
+		return "subtract"
+	return "replace"
+
+
 def aweCreateSet(name):
 	Set = FBSet("")
 	Set.LongName = name
@@ -160,15 +378,37 @@ def _createPicker(control,event):
 		if userInput[0] == 1:
 			name = userInput[1]
 			picker = Picker(name,objSet)
-			createPickerButton(name,picker)
-			_toolResize()
+			addPickersToTool(awePickerTool, [picker])
+
+
+def addPickersToTool(tool, pickers):
+	'''Adds newly created Pickers to the tool's list and creates their UI'''
+
+	tool.pickers.extend(pickers)
+	if tool.virtualized:
+		refreshPickerRows(tool)
+	elif tool.pendingPickers:
+		# keep the rows in the order of tool.pickers; the idle batches
+		# that are still running will build these as well
+		tool.pendingPickers.extend(pickers)
+	else:
+		for picker in pickers:
+			createPickerButton(picker.name,picker)
+	_toolResize()
 
 
 def createPickerButton(name,picker):
 	'''Creates Picker button UI and associates it with given Picker object'''
 
+	box = createPickerRow()
+	bindPickerRow(box, picker)
+	awePickerTool.pickerLayout.Add(box, 25, space=2)
+
+
+def createPickerRow():
+	'''Creates the UI of a single Picker row without associating a Picker'''
+
 	box = FBLayout()
-	box.picker = picker
 
 
 	# optionBtn region
@@ -183,7 +423,6 @@ def createPickerButton(name,picker):
 	#box.optionBtn.Look = FBButtonLook.kFBLookColorChange
 	#box.optionBtn.Style = FBButtonStyle.kFB2States
 	box.optionBtn.optionBoxVisible = False
-	box.optionBtn.picker = picker
 	box.optionBtn.OnClick.Add(_toggleOptionMenu)
 	box.SetControl("optionBtnRegion", box.optionBtn)
 
@@ -195,8 +434,6 @@ def createPickerButton(name,picker):
 	box.AddRegion("pickerBoxRegion", "pickerBoxRegion", x,y,w,h)
 
 	box.pickerBtn = FBButton()
-	box.pickerBtn.Caption = name
-	box.pickerBtn.picker = picker
 	box.pickerBtn.OnClick.Add(_pickerSelect)
 	box.SetControl("pickerBoxRegion", box.pickerBtn)
 
@@ -205,7 +442,20 @@ def createPickerButton(name,picker):
 	box.optionBtn.optionBox = box.optionBox = createOptionBox(box)
 	box.pickerBtn.box = box.optionBtn.box = box
 
-	awePickerTool.pickerLayout.Add(box, 25, space=2)
+	return box
+
+
+def bindPickerRow(box, picker):
+	'''Associates a Picker row and its buttons with the given Picker
+
+	Passing None blanks the row (used for unused rows of the virtualized list).
+	'''
+
+	box.picker = picker
+	for control in [box.pickerBtn, box.optionBtn] + box.optionBox.buttons:
+		control.picker = picker
+	box.pickerBtn.Caption = picker.name if picker else ""
+	box.pickerBtn.Enabled = box.optionBtn.Enabled = picker is not None
 
 
 def createOptionBox(parentBox):
@@ -216,7 +466,6 @@ def createOptionBox(parentBox):
 	addBtn = FBButton()
 	addBtn.Caption = "+"
 	addBtn.OnClick.Add(_addObjects)
-	addBtn.picker = parentBox.picker
 	addBtn.Look = FBButtonLook.kFBLookColorChange
 	addBtn.SetStateColor(FBButtonState.kFBButtonState0, FBColor(0.4,0.5,0.3))
 	addBtn.SetStateColor(FBButtonState.kFBButtonState1, FBColor(0.35,0.45,0.25))
@@ -228,7 +477,6 @@ def createOptionBox(parentBox):
 	removeBtn.SetStateColor(FBButtonState.kFBButtonState0, FBColor(0.4,0.2,0.5))
 	removeBtn.SetStateColor(FBButtonState.kFBButtonState1, FBColor(0.35,0.15,0.45))
 	removeBtn.OnClick.Add(_removeObjects)
-	removeBtn.picker = parentBox.picker
 	optionLayout.AddRelative(removeBtn,0.25,height=25, space=2)
 
 	renameBtn = FBButton()
@@ -237,7 +485,6 @@ def createOptionBox(parentBox):
 	renameBtn.SetStateColor(FBButtonState.kFBButtonState0, FBColor(0.3,0.4,0.5))
 	renameBtn.SetStateColor(FBButtonState.kFBButtonState1, FBColor(0.25,0.35,0.45))
 	renameBtn.OnClick.Add(_renamePicker)
-	renameBtn.picker = parentBox.picker
 	renameBtn.pickerButton = parentBox.pickerBtn
 	optionLayout.AddRelative(renameBtn,0.25,height=25, space=2)
 
@@ -247,10 +494,10 @@ def createOptionBox(parentBox):
 	deleteBtn.SetStateColor(FBButtonState.kFBButtonState0, FBColor(0.7,0.2,0.3))
 	deleteBtn.SetStateColor(FBButtonState.kFBButtonState1, FBColor(0.65,0.15,0.25))
 	deleteBtn.OnClick.Add(_deletePicker)
-	deleteBtn.picker = parentBox.picker
 	deleteBtn.box = parentBox
 	optionLayout.AddRelative(deleteBtn,0.25,height=25, space=2)
 
+	optionLayout.buttons = [addBtn, removeBtn, renameBtn, deleteBtn]
 	return optionLayout
 
 def _addObjects(control,event):
@@ -304,8 +551,7 @@ def _deletePicker(control,event):
 		deleteUI = True
 	if deleteUI:
 		control.picker.delete()
-		awePickerTool.pickerLayout.Remove(control.box)
-		_toolResize()
+		removePickerRow(awePickerTool, control.picker, control.box)
 
 
 def _toggleOptionMenu2(control,event):
@@ -347,10 +593,11 @@ def _toggleOptionMenu(control,event):
 		menu.InsertLast("Remove Selection",2)
 		menu.InsertLast("Rename Picker",3)
 		menu.InsertLast("Delete Picker",4)
+		menu.InsertLast("Select Tab",5)
 
 		item = menu.Execute(x,y)
 
-		print item
+		log("option menu item", item)
 
 		if item:
 			if item.Id == 1:
@@ -361,37 +608,54 @@ def _toggleOptionMenu(control,event):
 				_renamePicker(control,None)
 			if item.Id == 4:
 				_deletePicker(control,None)
+			if item.Id == 5:
+				selectTab(awePickerTool, control.picker.tab, _selectionMode())
 
 		menu.FBDelete()
 
 
 
+@timed("pickerSelect")
 def _pickerSelect(control,event):
 	if control.picker:
-		success = control.picker.select()
+		# shift adds, ctrl subtracts, shift+ctrl intersects
+		success = control.picker.select(_selectionMode())
 		if not success:
 			FBMessageBox("Picker Error", "An error occured: couldn't find Picker object.\nDeleting this Picker","OK")
-			awePickerTool.pickerLayout.Remove(control.box)
+			removePickerRow(awePickerTool, control.picker, control.box)
 
 	awePickerTool.pickerLayout.HardSelect()
 
+@timed("initPickers")
 def initPickers(tool):
 	log("initializing pickers")
 	log("tool", tool)
-	tool.pickerLayout.RemoveAll()
-	sets = FBSystem().Scene.Sets
-	masterSet = None
-	for s in sets:
-		if s.LongName == "awe:Pickers":
-			masterSet = s
+	FBSystem().OnUIIdle.Remove(_buildPendingPickers)
+	tool.pickers = []
+	tool.pendingPickers = []
+	tool.firstRow = 0
+	gPickerRegistry.build()
+	masterSet = gPickerRegistry.masterSet
 	if masterSet:
 		hideComponent(masterSet,masterSet.Items)
 		for t in masterSet.Items:
 			for p in t.Items:
+				# the Picker reads its objects from the set on demand,
+				# so there's no need to collect them here
 				name = p.PropertyList.Find("PickerName").Data
-				objects = [o for o in p.PropertyList.Find("Objects")]
-				picker = Picker(name,objects,p)
-				createPickerButton(name,picker)
+				tool.pickers.append(Picker(name,pickerObject=p,tab=t.LongName))
+
+	if tool.virtualized:
+		refreshPickerRows(tool)
+		return
+
+	# only build the buttons that are visible right away;
+	# the rest is built in batches while the UI is idle
+	tool.pickerLayout.RemoveAll()
+	tool.pendingPickers = list(tool.pickers)
+	buildPickerButtons(tool, _visibleRowCount(tool))
+	if tool.pendingPickers:
+		FBSystem().OnUIIdle.Add(_buildPendingPickers)
 
 
 	#_toolResize()
@@ -409,6 +673,200 @@ def initPickers(tool):
 
 
 
+def buildPickerButtons(tool, count):
+	'''Creates buttons for up to count Pickers waiting in tool.pendingPickers'''
+
+	batch = tool.pendingPickers[:count]
+	tool.pendingPickers = tool.pendingPickers[count:]
+	for picker in batch:
+		createPickerButton(picker.name, picker)
+	return len(batch)
+
+
+def _buildPendingPickers(control,event):
+	'''Callback:
+	Builds the next batch of Picker buttons while the UI is idle
+	'''
+
+	if not awePickerTool or not awePickerTool.pendingPickers:
+		FBSystem().OnUIIdle.Remove(_buildPendingPickers)
+		return
+	buildPickerButtons(awePickerTool, 20)
+	if not awePickerTool.pendingPickers:
+		FBSystem().OnUIIdle.Remove(_buildPendingPickers)
+	_toolResize()
+
+
+def _visibleRowCount(tool):
+	'''Number of Picker rows that fit into the tool's picker list'''
+
+	listBox = tool.pickerLayout if tool.virtualized else tool.scrollBox
+	height = listBox.RegionPosMaxY - listBox.RegionPosMinY
+	if height <= 0:
+		# not laid out yet
+		height = tool.StartSizeY
+	if tool.virtualized:
+		# rows can't be scrolled into view, so only count whole rows
+		return max(1, height // 27)
+	return height // 27 + 1
+
+
+def removePickerRow(tool, picker, box):
+	'''Removes a Picker from the tool's list and updates the UI'''
+
+	if picker in tool.pickers:
+		tool.pickers.remove(picker)
+	if tool.virtualized:
+		refreshPickerRows(tool)
+	elif picker in tool.pendingPickers:
+		# no row has been built for it yet
+		tool.pendingPickers.remove(picker)
+	else:
+		tool.pickerLayout.Remove(box)
+	_toolResize()
+
+
+def buildRowPool(tool, count):
+	'''(Re)creates the fixed pool of rows used by the virtualized list'''
+
+	tool.pickerLayout.RemoveAll()
+	tool.pickerRows = []
+	for i in range(count):
+		box = createPickerRow()
+		tool.pickerLayout.Add(box, 25, space=2)
+		tool.pickerRows.append(box)
+
+
+def refreshPickerRows(tool):
+	'''Binds the rows of the virtualized list to the Pickers currently in view'''
+
+	pickerCount = len(tool.pickers)
+	maxFirstRow = max(0, pickerCount - len(tool.pickerRows))
+	tool.firstRow = min(tool.firstRow, maxFirstRow)
+	for i, box in enumerate(tool.pickerRows):
+		index = tool.firstRow + i
+		bindPickerRow(box, tool.pickers[index] if index < pickerCount else None)
+
+	# vertical sliders grow upwards, so the top of the list is at Max
+	tool.rowSlider.Max = maxFirstRow
+	tool.rowSlider.Value = maxFirstRow - tool.firstRow
+	tool.rowSlider.Enabled = maxFirstRow > 0
+
+
+def _rowSliderChange(control,event):
+	'''Callback:
+	Scrolls the virtualized list to the row given by the slider
+	'''
+
+	firstRow = int(round(control.Max - control.Value))
+	if firstRow != awePickerTool.firstRow:
+		awePickerTool.firstRow = firstRow
+		refreshPickerRows(awePickerTool)
+
+
+def exportPickers(filePath):
+	'''Writes all Pickers in the Scene to a file
+
+	The file stores the tabs, the Picker names and the LongNames of each
+	Picker's objects, so the Pickers can be loaded into other scenes
+	with importPickers(). Returns the number of Pickers written.
+	'''
+
+	# always rescan; without the tool UI nothing resets the index between scenes
+	gPickerRegistry.build()
+	masterSet = gPickerRegistry.masterSet
+	tabs = []
+	count = 0
+	if masterSet:
+		for t in masterSet.Items:
+			pickers = []
+			for p in t.Items:
+				objects = [o.LongName for o in p.PropertyList.Find("Objects")]
+				pickers.append({"name": p.PropertyList.Find("PickerName").Data, "objects": objects})
+			tabs.append({"name": t.LongName, "pickers": pickers})
+			count += len(pickers)
+	with open(filePath, "w") as f:
+		json.dump({"version": gPickerFileVersion, "tabs": tabs}, f, separators=(",", ":"))
+	return count
+
+
+def importPickers(filePath):
+	'''Creates the Pickers stored in a file written by exportPickers()
+
+	Objects are looked up by LongName through an index built in a single
+	pass over the Scene. Returns the list of created Pickers and the names
+	of objects that couldn't be found.
+
+	Works without the tool UI, e.g. in a batch job:
+		import aweMBPicker
+		aweMBPicker.importPickers("path/to/pickers.json")
+	'''
+
+	with open(filePath) as f:
+		data = json.load(f)
+	version = data.get("version", 0)
+	if version > gPickerFileVersion:
+		raise ValueError("Picker file version %d is newer than supported version %d" % (version, gPickerFileVersion))
+
+	# always rescan; without the tool UI nothing resets the index between scenes
+	gPickerRegistry.build()
+
+	names = set()
+	for t in data["tabs"]:
+		for p in t["pickers"]:
+			names.update(p["objects"])
+	index = {}
+	for c in FBSystem().Scene.Components:
+		if c.LongName in names:
+			index[c.LongName] = c
+
+	pickers = []
+	for t in data["tabs"]:
+		for p in t["pickers"]:
+			objects = [index[n] for n in p["objects"] if n in index]
+			# json returns unicode; set names need to be plain strings
+			pickers.append(Picker(p["name"].encode("utf-8"), objects, tab=t["name"].encode("utf-8")))
+	missing = sorted(names.difference(index))
+
+	if awePickerTool:
+		addPickersToTool(awePickerTool, pickers)
+	return pickers, missing
+
+
+def _exportPickers(control,event):
+	'''Callback:
+	Prompts for a file and exports all Pickers to it
+	'''
+
+	popup = FBFilePopup()
+	popup.Caption = "Export Pickers"
+	popup.Style = FBFilePopupStyle.kFBFilePopupSave
+	popup.Filter = "*.json"
+	if popup.Execute():
+		count = exportPickers(popup.FullFilename)
+		log("exported", count, "pickers to", popup.FullFilename, level=LOG_INFO)
+
+
+def _importPickers(control,event):
+	'''Callback:
+	Prompts for a file and imports the Pickers stored in it
+	'''
+
+	popup = FBFilePopup()
+	popup.Caption = "Import Pickers"
+	popup.Style = FBFilePopupStyle.kFBFilePopupOpen
+	popup.Filter = "*.json"
+	if popup.Execute():
+		try:
+			pickers, missing = importPickers(popup.FullFilename)
+		except (IOError, ValueError, KeyError) as e:
+			FBMessageBox("Picker Error", "Could not import Pickers:\n%s" % e, "OK")
+			return
+		if missing:
+			FBMessageBox("Picker Import", "%d objects could not be found in the Scene" % len(missing), "OK")
+			log("missing objects:", ", ".join(missing), level=LOG_INFO)
+
+
 def hideComponent(component=None,componentList=None):
 	disallowedFlags = [FBObjectFlag.kFBFlagBrowsable, FBObjectFlag.kFBFlagRenamable]
 	if component:
@@ -423,25 +881,29 @@ def _pickerObjectDestroyed(object,event):
 	object.picker.pickerObject = None
 
 
+def _indexedSetDestroyed(object,event):
+	gPickerRegistry.forget(object)
+
+
+@timed("toolResize")
 def _toolResize(*args):
 
 	if not awePickerTool:
 		return
 	log("resizing")
+	if awePickerTool.virtualized:
+		rowCount = _visibleRowCount(awePickerTool)
+		if rowCount != len(awePickerTool.pickerRows):
+			buildRowPool(awePickerTool, rowCount)
+		refreshPickerRows(awePickerTool)
+		return
 	sb = awePickerTool.scrollBox
 	log(sb)
-	pl = awePickerTool.pickerLayout
 	sX = sb.RegionPosMaxX - sb.RegionPosMinX - 15
-	i = childCount = 0
-	log("checking children of pickerLayout")
-	box = pl.GetChild(i)
-	while box:
-		log("found picker box %s" % str(i))
-		i += 1
-		childCount += 1
-		box = pl.GetChild(i)
-
-	log("found %d picker boxes" % childCount)
+	# the list of Pickers knows how many rows there are (minus the ones
+	# still waiting to be built); no need to probe the layout for its children
+	childCount = len(awePickerTool.pickers) - len(awePickerTool.pendingPickers)
+	log("found", childCount, "pickers")
 	sY = 27 * childCount + 10
 	log("computed size Y: ", sY)
 	sb.SetContentSize(sX, sY)
@@ -456,7 +918,9 @@ def getUIChildren(control, pList=None, tabs=0, firstRun=True):
 	child = control.GetChild(i)
 	if control.ClassName() == "FBScrollBox":
 		child = control.Content.GetChild(i)
-	log("----"*tabs, control.ClassName(), control.RegionName if control.ClassName() == "FBLayout" else "")
+	gStats.count("uiChildren")
+	if gLogLevel <= LOG_DEBUG:
+		log("----"*tabs, control.ClassName(), control.RegionName if control.ClassName() == "FBLayout" else "")
 	while child:
 		pList.append(child)
 		getUIChildren(child, pList,tabs + 1,False)
@@ -490,29 +954,113 @@ def restructureAll(control,pList=None,firstRun=True):
 
 def _fileChange(control,event):
 	initPickers(awePickerTool)
+	# _removeSceneCB dropped all Scene callbacks before the file was loaded
+	FBSystem().Scene.OnChange.Remove(_monitorSet)
+	FBSystem().Scene.OnChange.Add(_monitorSet)
 	
 
 def _removeSceneCB(control,event):
 	FBSystem().Scene.OnChange.RemoveAll()
+	gPickerRegistry.clear()
+	gSceneMonitor.clear()
+
+
+class SceneMonitor(object):
+	'''Collects detached sets from Scene change events and handles them on idle
+
+	Merges, plots and retargeting send thousands of Scene change events.
+	_monitorSet() only does a cheap check per event and queues the Pickers of
+	detached sets (never the sets themselves, they may be destroyed by the
+	time the queue is processed); the queue is processed once per UI idle tick. While suspended (see
+	suspendSceneMonitor()), events are ignored altogether.
+	'''
+
+	def __init__(self):
+		self.suspended = 0
+		self.queue = []
+		self.scheduled = False
+
+	def clear(self):
+		self.queue = []
+		FBSystem().OnUIIdle.Remove(_processDetachedSets)
+		self.scheduled = False
+
+	def push(self, picker, isMasterSet):
+		self.queue.append((picker, isMasterSet))
+		if not self.scheduled:
+			FBSystem().OnUIIdle.Add(_processDetachedSets)
+			self.scheduled = True
+
+	def process(self):
+		'''Handles all sets detached since the last idle tick'''
+
+		queue = self.queue
+		self.clear()
+		masterSetDetached = False
+		for picker, isMasterSet in queue:
+			if isMasterSet:
+				masterSetDetached = True
+			elif picker:
+				picker.pickerObject = None
+		if masterSetDetached:
+			FBMessageBox("Picker Error", "Hey! You just deleted the Picker set! Undo that please or I will crash", "OK")
+
+
+gSceneMonitor = SceneMonitor()
+
+
+@contextmanager
+def suspendSceneMonitor():
+	'''Ignores Scene changes while running bulk operations
+
+	Usage:
+		with aweMBPicker.suspendSceneMonitor():
+			# plot, merge, retarget...
+	'''
+
+	gSceneMonitor.suspended += 1
+	try:
+		yield
+	finally:
+		gSceneMonitor.suspended -= 1
 
 
 def _monitorSet(control,event):
 	'''Callback:
 	Check for manual deletion of a picker object (FBSet).
 	If it's the master set, prompt for undo. If it's a picker 
-	set, notify the associated Picker object
+	set, notify the associated Picker object.
+	Runs for every Scene change, so anything but detached sets is
+	discarded right away and the rest is handled on idle by gSceneMonitor.
 	'''
 
-	if event.Type == FBSceneChangeType.kFBSceneChangeDetach:
-		c = event.ChildComponent
-		if c.Is(44) and c.IsSDKComponent():
-			if c.LongName == "awe:Pickers":
-				FBMessageBox("Picker Error", "Hey! You just deleted the Picker set! Undo that please or I will crash", "OK")
-				return
-			for p in c.Parents:
-				if p.LongName == "awe:Pickers":
-					if c.picker:
-						c.picker.pickerObject = None
+	if gSceneMonitor.suspended or event.Type != FBSceneChangeType.kFBSceneChangeDetach:
+		return
+	c = event.ChildComponent
+	if c.Is(44) and c.IsSDKComponent():
+		isMasterSet = c.LongName == PickerRegistry.masterSetName
+		picker = getattr(c, "picker", None)
+		if isMasterSet or picker:
+			gSceneMonitor.push(picker, isMasterSet)
+
+
+def _processDetachedSets(control,event):
+	gSceneMonitor.process()
+
+
+def _fileMerge(control,event):
+	'''Callback:
+	Suspends the Scene monitor for the duration of a merge.
+	The merge is done once the UI is idle again.
+	'''
+
+	gSceneMonitor.suspended += 1
+	FBSystem().OnUIIdle.Add(_fileMergeCompleted)
+
+
+def _fileMergeCompleted(control,event):
+	FBSystem().OnUIIdle.Remove(_fileMergeCompleted)
+	gSceneMonitor.suspended -= 1
 
 
 
@@ -525,10 +1073,15 @@ def aweCreateBaseUI(tool):
 	# -- MainLayout
 	# -- |-- Edit Layout
 	# -- |-- |-- Add Button
+	# -- |-- |-- Import / Export Buttons
 	# -- |-- ScrollBox
 	# -- |-- |-- Picker Layout
 	# -- |-- |-- |-- Picker Box
 	# -- |-- |-- |-- ...
+	#
+	# In virtualized mode, the ScrollBox is replaced by:
+	# -- |-- Picker Layout (fixed pool of Picker Boxes)
+	# -- |-- Row Slider
 	# ------------------------------
 
 	startX = 175
@@ -537,6 +1090,10 @@ def aweCreateBaseUI(tool):
 
 	tool.StartSizeX = startX
 	tool.StartSizeY = startY
+	tool.virtualized = gVirtualizedList
+	tool.pickers = []
+	tool.pickerRows = []
+	tool.firstRow = 0
 	tool.OnResize.Add(_toolResize)
 
 	# ----------------------
@@ -569,6 +1126,21 @@ def aweCreateBaseUI(tool):
 	editLayout.Add(addBtn, 30, space=0, height=30)
 	addBtn.OnClick.Add(_createPicker)
 
+	importBtn = FBButton()
+	importBtn.Caption = "Import"
+	editLayout.Add(importBtn, 50, space=5, height=30)
+	importBtn.OnClick.Add(_importPickers)
+
+	exportBtn = FBButton()
+	exportBtn.Caption = "Export"
+	editLayout.Add(exportBtn, 50, space=2, height=30)
+	exportBtn.OnClick.Add(_exportPickers)
+
+	if tool.virtualized:
+		aweCreateVirtualListUI(tool, mainLayout)
+		initPickers(tool)
+		_addCallbacks(tool)
+		return
 
 	# ----------------------
 	# ScrollBox for Picker List
@@ -599,8 +1171,49 @@ def aweCreateBaseUI(tool):
 
 	# clear pickers and rebuild from existing picker objects
 	initPickers(tool)
+	_addCallbacks(tool)
+
+
+def aweCreateVirtualListUI(tool, mainLayout):
+	'''Creates the Picker list of the virtualized mode
+
+	Instead of a ScrollBox holding a row for every Picker, the list is a
+	fixed pool of rows (sized to the visible area in _toolResize) and a
+	slider that picks which Pickers the rows show.
+	'''
+
+	# ----------------------
+	# Row Slider (right)
+	# ---------------------
+	x = FBAddRegionParam(-15,FBAttachType.kFBAttachRight,"")
+	y = FBAddRegionParam(0,FBAttachType.kFBAttachBottom,"editRegion")
+	w = FBAddRegionParam(0,FBAttachType.kFBAttachRight,"")
+	h = FBAddRegionParam(5,FBAttachType.kFBAttachBottom,"")
+	mainLayout.AddRegion("rowSliderRegion", "rowSliderRegion", x,y,w,h)
+
+	tool.rowSlider = FBSlider()
+	tool.rowSlider.Orientation = FBOrientation.kFBVertical
+	tool.rowSlider.Min = tool.rowSlider.Max = tool.rowSlider.Value = 0
+	tool.rowSlider.OnChange.Add(_rowSliderChange)
+	mainLayout.SetControl("rowSliderRegion", tool.rowSlider)
+
+	# ----------------------
+	# Picker Layout (row pool)
+	# ---------------------
+	x = FBAddRegionParam(0,FBAttachType.kFBAttachLeft,"")
+	y = FBAddRegionParam(0,FBAttachType.kFBAttachBottom,"editRegion")
+	w = FBAddRegionParam(-2,FBAttachType.kFBAttachLeft,"rowSliderRegion")
+	h = FBAddRegionParam(5,FBAttachType.kFBAttachBottom,"")
+	mainLayout.AddRegion("pickerRegion", "pickerRegion", x,y,w,h)
+
+	tool.pickerLayout = pyui.FBVBoxLayout()
+	mainLayout.SetControl("pickerRegion", tool.pickerLayout)
+	buildRowPool(tool, _visibleRowCount(tool))
+
+
+def _addCallbacks(tool):
+	'''Adds the file and scene callbacks the tool relies on'''
 
-	# add callbacks to scene
 	tool.app = FBApplication()
 	#tool.app.OnFileNewCompleted.RemoveAll()
 	tool.app.OnFileNewCompleted.Add(_fileChange)
@@ -609,6 +1222,7 @@ def aweCreateBaseUI(tool):
 	tool.app.OnFileExit.Add(_removeSceneCB)
 	tool.app.OnFileNew.Add(_removeSceneCB)
 	tool.app.OnFileOpen.Add(_removeSceneCB)
+	tool.app.OnFileMerge.Add(_fileMerge)
 	FBSystem().Scene.OnChange.Add(_monitorSet)
 
 